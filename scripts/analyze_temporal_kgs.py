@@ -6,15 +6,90 @@ Examples:
     python scripts/analyze_temporal_kgs.py
     python scripts/analyze_temporal_kgs.py --base-dir TemporalKGs --json-output stats.json
     python scripts/analyze_temporal_kgs.py --per-file --top-n 3
+    python scripts/analyze_temporal_kgs.py --cache-dir .cache/temporal_kg_stats
 """
 
 import argparse
+import hashlib
 import json
 import os
+import pickle
+import re
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass, field
-from datetime import datetime
-from typing import Dict, Iterable, List, Optional
+from datetime import date, datetime
+from heapq import nlargest
+from itertools import repeat
+from operator import itemgetter
+from sys import intern
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple, Union
+
+from line_blocks import read_line_blocks
+
+# Bump when Stats or the parsing rules change so stale --cache-dir entries are ignored.
+STATS_CACHE_VERSION = 2
+
+_date_cache: Dict[str, Tuple[date, int]] = {}
+
+_count_key = itemgetter(1)
+
+# Columns a row needs before its temporal fields are read: ICEWS has a date in
+# column 3; Wikidata and YAGO have a marker in column 3 and a date in column 4.
+TEMPORAL_ROW_WIDTH = {"icews": 4, "wikidata": 5, "yago": 5}
+
+# YAGO dates look like "1998-##-##"; the year is the first run of four digits.
+_YAGO_YEAR_RE = re.compile(r"\d{4}")
+
+
+class MisraGries:
+    """Bounded frequency summary keeping at most `k` counters (Misra-Gries).
+
+    Reported counts are lower bounds that undercount by at most n / (k + 1),
+    where n is the number of items added. Summaries merge without losing that
+    guarantee, so items are added a block at a time as exact counts. `update`,
+    `items` and `most_common` mirror Counter so the summary can stand in for one
+    in Stats.
+    """
+
+    def __init__(self, k: int) -> None:
+        self.k = k
+        self.counts: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def __add__(self, other: "MisraGries") -> "MisraGries":
+        combined = MisraGries(self.k)
+        combined.merge(self.counts)
+        combined.merge(other.counts)
+        return combined
+
+    def update(self, other: Union["MisraGries", Mapping[str, int], Iterable[str]]) -> None:
+        if isinstance(other, MisraGries):
+            self.merge(other.counts)
+        elif isinstance(other, Mapping):
+            self.merge(other)
+        else:
+            self.merge(Counter(other))
+
+    def merge(self, other: Mapping[str, int]) -> None:
+        if self.k <= 0:
+            return
+        counts = self.counts
+        for item, count in other.items():
+            counts[item] = counts.get(item, 0) + count
+        if len(counts) > self.k:
+            threshold = nlargest(self.k + 1, counts.values())[-1]
+            self.counts = {
+                item: count - threshold for item, count in counts.items() if count > threshold
+            }
+
+    def items(self) -> Iterable[Tuple[str, int]]:
+        return self.counts.items()
+
+    def most_common(self, n: int) -> List[Tuple[str, int]]:
+        return top_items(self, n)
 
 
 @dataclass
@@ -22,12 +97,8 @@ class Stats:
     """Holds running statistics for a KG split."""
 
     triples: int = 0
-    subjects: set = field(default_factory=set)
-    objects: set = field(default_factory=set)
-    relations: set = field(default_factory=set)
     subject_counter: Counter = field(default_factory=Counter)
     object_counter: Counter = field(default_factory=Counter)
-    entity_counter: Counter = field(default_factory=Counter)
     relation_counter: Counter = field(default_factory=Counter)
     year_counter: Counter = field(default_factory=Counter)
     temporal_marker_counter: Counter = field(default_factory=Counter)
@@ -49,18 +120,21 @@ def guess_dataset_type(dataset_name: str) -> str:
     return "generic"
 
 
-def init_stats() -> Stats:
-    return Stats()
+def init_stats(approx_k: Optional[int] = None) -> Stats:
+    """Create empty Stats; with `approx_k`, entity/relation counts use MisraGries."""
+    if approx_k is None:
+        return Stats()
+    return Stats(
+        subject_counter=MisraGries(approx_k),
+        object_counter=MisraGries(approx_k),
+        relation_counter=MisraGries(approx_k),
+    )
 
 
 def merge_stats(acc: Stats, other: Stats) -> None:
     acc.triples += other.triples
-    acc.subjects.update(other.subjects)
-    acc.objects.update(other.objects)
-    acc.relations.update(other.relations)
     acc.subject_counter.update(other.subject_counter)
     acc.object_counter.update(other.object_counter)
-    acc.entity_counter.update(other.entity_counter)
     acc.relation_counter.update(other.relation_counter)
     acc.year_counter.update(other.year_counter)
     acc.temporal_marker_counter.update(other.temporal_marker_counter)
@@ -81,94 +155,201 @@ def merge_stats(acc: Stats, other: Stats) -> None:
             acc.max_year = other.max_year
 
 
-def parse_temporal_tokens(tokens: List[str], dataset_type: str, stats: Stats) -> None:
+def parse_icews_date(token: str) -> Optional[Tuple[date, int]]:
+    cached = _date_cache.get(token)
+    if cached is None:
+        try:
+            dt = datetime.strptime(token, "%Y-%m-%d")
+        except ValueError:
+            return None
+        cached = (dt.date(), dt.year)
+        _date_cache[token] = cached
+    return cached
+
+
+def parse_wikidata_year(token: str) -> Optional[int]:
+    token = token.strip()
+    if not token:
+        return None
+    try:
+        return int(token)
+    except ValueError:
+        return None
+
+
+def parse_yago_year(token: str) -> Optional[int]:
+    match = _YAGO_YEAR_RE.search(token)
+    return int(match.group(0)) if match else None
+
+
+def add_temporal_counts(
+    stats: Stats, dataset_type: str, marker_counts: Counter, date_counts: Counter
+) -> None:
+    """Fold one file's raw temporal marker and date token counts into `stats`.
+
+    Both columns have few distinct values, so process_file counts the raw tokens
+    and each distinct token is parsed here once, weighted by how often it occurs.
+    """
     if dataset_type == "icews":
-        if len(tokens) >= 4:
-            date_str = tokens[3]
-            try:
-                dt = datetime.strptime(date_str, "%Y-%m-%d")
-            except ValueError:
-                return
-            stats.year_counter[dt.year] += 1
-            date_value = dt.date()
+        for token, count in date_counts.items():
+            parsed = parse_icews_date(token)
+            if parsed is None:
+                continue
+            date_value, year = parsed
+            stats.year_counter[year] += count
             if stats.min_date is None or date_value < stats.min_date:
                 stats.min_date = date_value
             if stats.max_date is None or date_value > stats.max_date:
                 stats.max_date = date_value
-    elif dataset_type == "wikidata":
-        if len(tokens) >= 5:
-            marker = tokens[3]
-            year_token = tokens[4].strip()
-            stats.temporal_marker_counter[marker] += 1
-            stats.temporal_records += 1
-            if year_token:
-                try:
-                    year = int(year_token)
-                except ValueError:
-                    return
-                stats.year_counter[year] += 1
-                if stats.min_year is None or year < stats.min_year:
-                    stats.min_year = year
-                if stats.max_year is None or year > stats.max_year:
-                    stats.max_year = year
-    elif dataset_type == "yago":
-        if len(tokens) >= 5:
-            marker = tokens[3].strip("<>\"")
-            date_token = tokens[4].strip("\"")
-            stats.temporal_marker_counter[marker] += 1
-            stats.temporal_records += 1
-            digits = "".join(ch for ch in date_token if ch.isdigit())
-            if len(digits) >= 4:
-                year = int(digits[:4])
-                stats.year_counter[year] += 1
-                if stats.min_year is None or year < stats.min_year:
-                    stats.min_year = year
-                if stats.max_year is None or year > stats.max_year:
-                    stats.max_year = year
-
-
-def process_file(path: str, dataset_type: str) -> Stats:
-    stats = init_stats()
-    with open(path, "r", encoding="utf-8") as fh:
-        for raw_line in fh:
+        return
+
+    stats.temporal_records += sum(marker_counts.values())
+    for marker, count in marker_counts.items():
+        if dataset_type == "yago":
+            marker = marker.strip("<>\"")
+        stats.temporal_marker_counter[marker] += count
+
+    parse_year = parse_wikidata_year if dataset_type == "wikidata" else parse_yago_year
+    for token, count in date_counts.items():
+        year = parse_year(token)
+        if year is None:
+            continue
+        stats.year_counter[year] += count
+        if stats.min_year is None or year < stats.min_year:
+            stats.min_year = year
+        if stats.max_year is None or year > stats.max_year:
+            stats.max_year = year
+
+
+def process_file(path: str, dataset_type: str, approx_k: Optional[int] = None) -> Stats:
+    stats = init_stats(approx_k)
+    marker_counts: Counter = Counter()
+    date_counts: Counter = Counter()
+    temporal_width = TEMPORAL_ROW_WIDTH.get(dataset_type, 0)
+    for lines in read_line_blocks(path):
+        subjects: List[str] = []
+        relations: List[str] = []
+        objects: List[str] = []
+        markers: List[str] = []
+        dates: List[str] = []
+        for raw_line in lines:
             line = raw_line.strip()
             if not line:
                 continue
             tokens = line.split("\t")
             if len(tokens) < 3:
                 continue
-            subj, rel, obj = tokens[0], tokens[1], tokens[2]
-            stats.triples += 1
-            stats.subjects.add(subj)
-            stats.objects.add(obj)
-            stats.relations.add(rel)
-            stats.subject_counter[subj] += 1
-            stats.object_counter[obj] += 1
-            stats.entity_counter[subj] += 1
-            stats.entity_counter[obj] += 1
-            stats.relation_counter[rel] += 1
-            parse_temporal_tokens(tokens, dataset_type, stats)
+            subjects.append(intern(tokens[0]))
+            relations.append(intern(tokens[1]))
+            objects.append(intern(tokens[2]))
+            if temporal_width and len(tokens) >= temporal_width:
+                if temporal_width == 5:
+                    markers.append(tokens[3])
+                dates.append(tokens[temporal_width - 1])
+
+        stats.triples += len(subjects)
+        stats.subject_counter.update(subjects)
+        stats.object_counter.update(objects)
+        stats.relation_counter.update(relations)
+        marker_counts.update(markers)
+        date_counts.update(dates)
+    if temporal_width:
+        add_temporal_counts(stats, dataset_type, marker_counts, date_counts)
     return stats
 
 
-def summarize(stats: Stats, top_n: int) -> Dict[str, object]:
-    return {
+def load_or_process_file(
+    path: str,
+    dataset_type: str,
+    approx_k: Optional[int] = None,
+    cache_dir: Optional[str] = None,
+) -> Stats:
+    """Return process_file's Stats, reusing a pickled copy from `cache_dir` if present.
+
+    Cache entries are keyed by the split's path, size and mtime plus the parsing
+    options, so editing a split or changing options causes a fresh parse.
+    Unreadable entries are re-parsed, and writing a new entry for a split removes
+    the ones left over from its earlier versions.
+    """
+    if cache_dir is None:
+        return process_file(path, dataset_type, approx_k)
+    info = os.stat(path)
+    split_key = (os.path.abspath(path), dataset_type, approx_k)
+    version_key = (STATS_CACHE_VERSION, info.st_size, info.st_mtime_ns)
+    prefix = f"{os.path.basename(path)}.{_digest(split_key)}."
+    cache_path = os.path.join(cache_dir, f"{prefix}{_digest(version_key)}.pickle")
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, "rb") as fh:
+                stats = pickle.load(fh)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            stats = None  # truncated or written by an incompatible version
+        if isinstance(stats, Stats):
+            return stats
+
+    stats = process_file(path, dataset_type, approx_k)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as fh:
+        pickle.dump(stats, fh, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
+    with os.scandir(cache_dir) as it:
+        stale = [
+            entry.path
+            for entry in it
+            if entry.name.startswith(prefix)
+            and entry.name.endswith(".pickle")
+            and entry.path != cache_path
+        ]
+    for stale_path in stale:
+        try:
+            os.remove(stale_path)
+        except FileNotFoundError:
+            pass
+    return stats
+
+
+def _digest(key: Tuple[object, ...]) -> str:
+    return hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:16]
+
+
+def top_items(counter: Union[Counter, MisraGries], n: int) -> List[Tuple[object, int]]:
+    """Same result as counter.most_common(n), without going through Counter's wrapper."""
+    return nlargest(n, counter.items(), key=_count_key)
+
+
+def summarize(
+    stats: Stats, top_n: int, include_directional_tops: bool = False
+) -> Dict[str, object]:
+    # MisraGries summaries drop rare keys, so distinct counts are only known
+    # when the counters are exact.
+    exact = not isinstance(stats.subject_counter, MisraGries)
+    entity_counter = stats.subject_counter + stats.object_counter
+    summary: Dict[str, object] = {
         "triples": stats.triples,
-        "unique_subjects": len(stats.subjects),
-        "unique_objects": len(stats.objects),
-        "unique_relations": len(stats.relations),
-        "top_entities": stats.entity_counter.most_common(top_n),
-        "top_subjects": stats.subject_counter.most_common(top_n),
-        "top_objects": stats.object_counter.most_common(top_n),
-        "top_relations": stats.relation_counter.most_common(top_n),
-        "top_years": stats.year_counter.most_common(top_n),
-        "temporal_markers": stats.temporal_marker_counter.most_common(top_n),
+        "unique_subjects": len(stats.subject_counter) if exact else None,
+        "unique_objects": len(stats.object_counter) if exact else None,
+        "unique_relations": len(stats.relation_counter) if exact else None,
+        "top_entities": top_items(entity_counter, top_n),
+    }
+    if include_directional_tops:
+        summary["top_subjects"] = top_items(stats.subject_counter, top_n)
+        summary["top_objects"] = top_items(stats.object_counter, top_n)
+    summary.update({
+        "top_relations": top_items(stats.relation_counter, top_n),
+        "top_years": top_items(stats.year_counter, top_n),
+        "temporal_markers": top_items(stats.temporal_marker_counter, top_n),
         "temporal_records": stats.temporal_records,
         "min_date": stats.min_date.isoformat() if stats.min_date else None,
         "max_date": stats.max_date.isoformat() if stats.max_date else None,
         "min_year": stats.min_year,
         "max_year": stats.max_year,
-    }
+    })
+    return summary
+
+
+def format_count(value: Optional[int]) -> str:
+    return "n/a" if value is None else f"{value:,}"
 
 
 def humanize(dataset_name: str, summary: Dict[str, object], top_n: int) -> List[str]:
@@ -176,9 +357,9 @@ def humanize(dataset_name: str, summary: Dict[str, object], top_n: int) -> List[
     lines.append(f"=== {dataset_name} ===")
     lines.append(
         f"Total triples: {summary['triples']:,}"
-        + f"; unique subjects: {summary['unique_subjects']:,}"
-        + f"; unique objects: {summary['unique_objects']:,}"
-        + f"; relations: {summary['unique_relations']:,}"
+        + f"; unique subjects: {format_count(summary['unique_subjects'])}"
+        + f"; unique objects: {format_count(summary['unique_objects'])}"
+        + f"; relations: {format_count(summary['unique_relations'])}"
     )
     if summary["top_entities"]:
         lines.append(
@@ -211,39 +392,71 @@ def humanize(dataset_name: str, summary: Dict[str, object], top_n: int) -> List[
 
 
 def discover_datasets(base_dir: str, include: Optional[Iterable[str]]) -> List[str]:
-    entries = sorted(
-        name
-        for name in os.listdir(base_dir)
-        if os.path.isdir(os.path.join(base_dir, name))
-    )
+    with os.scandir(base_dir) as it:
+        entries = sorted(entry.name for entry in it if entry.is_dir())
     if include:
         include_lower = {item.lower() for item in include}
         entries = [name for name in entries if name.lower() in include_lower]
     return entries
 
 
-def analyze(base_dir: str, top_n: int, include: Optional[List[str]], per_file: bool):
+def analyze(
+    base_dir: str,
+    top_n: int,
+    include: Optional[List[str]],
+    per_file: bool,
+    workers: Optional[int] = None,
+    approx_k: Optional[int] = None,
+    cache_dir: Optional[str] = None,
+    include_directional_tops: bool = False,
+):
     results: Dict[str, Dict[str, object]] = {}
     datasets = discover_datasets(base_dir, include)
     if not datasets:
         raise SystemExit(f"No dataset folders found under {base_dir}.")
 
+    jobs: List[Tuple[str, str, str, str]] = []
     for dataset in datasets:
         dataset_dir = os.path.join(base_dir, dataset)
         dataset_type = guess_dataset_type(dataset)
-        aggregate = init_stats()
-        file_summaries: Dict[str, Dict[str, object]] = {}
-        for filename in sorted(os.listdir(dataset_dir)):
-            if not filename.endswith(".txt"):
-                continue
-            path = os.path.join(dataset_dir, filename)
-            stats = process_file(path, dataset_type)
-            merge_stats(aggregate, stats)
+        with os.scandir(dataset_dir) as it:
+            splits = sorted(
+                (entry.name, entry.path) for entry in it if entry.name.endswith(".txt")
+            )
+        for filename, path in splits:
+            jobs.append((dataset, filename, path, dataset_type))
+
+    # Every split is parsed independently, so all of them are spread across one
+    # process pool; results come back in submission order. The pool is capped at
+    # one process per split, since all of them are started up front.
+    max_workers = max(min(workers or os.cpu_count() or 1, len(jobs)), 1)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        file_stats = executor.map(
+            load_or_process_file,
+            [job[2] for job in jobs],
+            [job[3] for job in jobs],
+            repeat(approx_k),
+            repeat(cache_dir),
+        )
+        aggregates: Dict[str, Stats] = {
+            dataset: init_stats(approx_k) for dataset in datasets
+        }
+        file_summaries: Dict[str, Dict[str, Dict[str, object]]] = {
+            dataset: {} for dataset in datasets
+        }
+        for (dataset, filename, _, _), stats in zip(jobs, file_stats):
+            merge_stats(aggregates[dataset], stats)
             if per_file:
-                file_summaries[filename] = summarize(stats, top_n)
+                file_summaries[dataset][filename] = summarize(
+                    stats, top_n, include_directional_tops
+                )
+
+    for dataset in datasets:
         results[dataset] = {
-            "aggregate": summarize(aggregate, top_n),
-            "files": file_summaries,
+            "aggregate": summarize(
+                aggregates[dataset], top_n, include_directional_tops
+            ),
+            "files": file_summaries[dataset],
         }
     return results
 
@@ -277,9 +490,43 @@ def main() -> None:
         action="store_true",
         help="Include per-split summaries in the JSON output and console log.",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Number of worker processes used to parse splits (default: one per CPU).",
+    )
+    parser.add_argument(
+        "--approximate-top",
+        action="store_true",
+        help="Track top entities/relations with bounded Misra-Gries summaries of "
+        "10 x --top-n counters, so memory no longer grows with the vocabulary; "
+        "their reported counts become lower bounds and unique counts are not reported.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help="Optional folder for cached per-split statistics; unchanged splits are "
+        "not re-parsed on later runs.",
+    )
+    parser.add_argument(
+        "--include-directional-tops",
+        action="store_true",
+        help="Also report top subjects and top objects separately in the JSON output.",
+    )
     args = parser.parse_args()
-
-    results = analyze(args.base_dir, args.top_n, args.datasets, args.per_file)
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    approx_k = 10 * args.top_n if args.approximate_top else None
+    results = analyze(
+        args.base_dir,
+        args.top_n,
+        args.datasets,
+        args.per_file,
+        args.workers,
+        approx_k,
+        args.cache_dir,
+        args.include_directional_tops,
+    )
 
     for dataset, payload in results.items():
         lines = humanize(dataset, payload["aggregate"], args.top_n)
@@ -14,37 +14,55 @@ Example:
 """
 
 import argparse
+import http.client
 import itertools
 import json
+import os
+import shutil
 import sys
+import threading
 import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from pathlib import Path
-from typing import Dict, Iterable, List, Set
-from urllib.parse import urlencode
-from urllib.request import Request, urlopen
-import ssl
+from typing import Deque, Dict, Iterable, List, Optional, Set, Tuple
+from urllib.error import HTTPError
+from urllib.parse import urlencode, urlsplit
 
 WIKIDATA_API = "https://www.wikidata.org/w/api.php"
 MAX_IDS_PER_REQUEST = 50
+DEFAULT_WORKERS = 8
+USER_AGENT = "TemporalKGLabelFetcher/1.0 (https://example.org/contact)"
+# Throttled (429) or unavailable (503) responses are retried after the server's
+# Retry-After, or an exponential backoff if it sends none.
+RETRY_STATUSES = (429, 503)
+MAX_RETRIES = 5
+
+# One keep-alive HTTPS connection per fetch thread, so TLS handshakes are paid
+# once per worker rather than once per batch.
+_thread_state = threading.local()
 
 
 def collect_entity_ids(dataset_dir: Path) -> Set[str]:
-    entity_ids: Set[str] = set()
+    candidates: Set[str] = set()
     for entry in sorted(dataset_dir.iterdir()):
         if entry.suffix != ".txt":
             continue
         with entry.open("r", encoding="utf-8") as fh:
             for raw_line in fh:
-                line = raw_line.strip()
-                if not line:
-                    continue
-                parts = line.split("\t")
-                if len(parts) < 3:
-                    continue
-                for candidate in (parts[0], parts[2]):
-                    if candidate.startswith("Q") and candidate[1:].isdigit():
-                        entity_ids.add(candidate)
-    return entity_ids
+                # Only columns 0 and 2 are needed, so stop splitting after the fourth.
+                parts = raw_line.strip().split("\t", 3)
+                if len(parts) > 2:
+                    candidates.add(parts[0])
+                    candidates.add(parts[2])
+    # Most subjects and objects repeat, so test the distinct values only.
+    return {
+        candidate
+        for candidate in candidates
+        if candidate.startswith("Q") and candidate[1:].isdigit()
+    }
 
 
 def batched(iterable: Iterable[str], size: int) -> Iterable[List[str]]:
@@ -56,6 +74,79 @@ def batched(iterable: Iterable[str], size: int) -> Iterable[List[str]]:
         yield batch
 
 
+class RateLimiter:
+    """Spaces request start times at least `interval` seconds apart across threads."""
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next_slot = time.monotonic()
+
+    def wait(self) -> None:
+        if self.interval <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def _connection() -> http.client.HTTPSConnection:
+    connection = getattr(_thread_state, "connection", None)
+    if connection is None:
+        connection = http.client.HTTPSConnection(urlsplit(WIKIDATA_API).netloc, timeout=30)
+        _thread_state.connection = connection
+    return connection
+
+
+def _request(path: str, headers: Dict[str, str]) -> Tuple[http.client.HTTPResponse, bytes]:
+    for attempt in range(2):
+        connection = _connection()
+        try:
+            connection.request("GET", path, headers=headers)
+            response = connection.getresponse()
+            body = response.read()
+            break
+        except (http.client.HTTPException, OSError):
+            # The server may drop an idle keep-alive connection; reconnect once.
+            connection.close()
+            _thread_state.connection = None
+            if attempt:
+                raise
+    return response, body
+
+
+def _retry_delay(retry_after: Optional[str], retry: int) -> float:
+    if retry_after:
+        try:
+            return max(float(retry_after), 0.0)
+        except ValueError:
+            pass
+        try:
+            when = parsedate_to_datetime(retry_after)
+        except (TypeError, ValueError):
+            pass
+        else:
+            return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+    return float(2**retry)
+
+
+def _get_json(url: str) -> Dict[str, object]:
+    target = urlsplit(url)
+    path = f"{target.path}?{target.query}"
+    headers = {"User-Agent": USER_AGENT}
+    for retry in range(MAX_RETRIES + 1):
+        response, body = _request(path, headers)
+        if response.status not in RETRY_STATUSES or retry == MAX_RETRIES:
+            break
+        time.sleep(_retry_delay(response.getheader("Retry-After"), retry))
+    if response.status != 200:
+        raise HTTPError(url, response.status, response.reason, response.headers, None)
+    return json.loads(body)
+
+
 def fetch_labels(ids: List[str], language: str = "en") -> Dict[str, str]:
     params = {
         "action": "wbgetentities",
@@ -64,18 +155,7 @@ def fetch_labels(ids: List[str], language: str = "en") -> Dict[str, str]:
         "props": "labels",
         "languages": language,
     }
-    url = f"{WIKIDATA_API}?{urlencode(params)}"
-    context = ssl.create_default_context()
-    context.check_hostname = False
-    context.verify_mode = ssl.CERT_NONE
-    request = Request(
-        url,
-        headers={
-            "User-Agent": "TemporalKGLabelFetcher/1.0 (https://example.org/contact)",
-        },
-    )
-    with urlopen(request, timeout=30, context=context) as response:
-        payload = json.load(response)
+    payload = _get_json(f"{WIKIDATA_API}?{urlencode(params)}")
     entities = payload.get("entities", {})
     results: Dict[str, str] = {}
     for entity_id, data in entities.items():
@@ -85,27 +165,101 @@ def fetch_labels(ids: List[str], language: str = "en") -> Dict[str, str]:
             results[entity_id] = label_entry.get("value", "")
         else:
             results[entity_id] = ""
+        # Redirected IDs come back under their target; file the label under both.
+        redirect_from = data.get("redirects", {}).get("from")
+        if redirect_from:
+            results[redirect_from] = results[entity_id]
     return results
 
 
-def build_mapping(dataset_dir: Path, language: str = "en", delay: float = 0.1) -> Dict[str, str]:
-    entity_ids = sorted(collect_entity_ids(dataset_dir))
+def load_existing_ids(output_path: Path) -> Set[str]:
+    """Return IDs already written to `output_path`, dropping a partial last line."""
+    if not output_path.exists():
+        return set()
+    with output_path.open("rb+") as fh:
+        data = fh.read()
+        complete = data.rfind(b"\n") + 1
+        if complete < len(data):
+            fh.truncate(complete)
+    return {
+        line.split(b"\t", 1)[0].decode("utf-8")
+        for line in data[:complete].splitlines()
+        if line
+    }
+
+
+def build_mapping(
+    dataset_dir: Path,
+    output_path: Path,
+    language: str = "en",
+    delay: float = 0.1,
+    workers: int = DEFAULT_WORKERS,
+    resume: bool = False,
+) -> int:
+    """Write labels for the dataset's entity IDs to `output_path`; returns the rows written."""
+    entity_ids = collect_entity_ids(dataset_dir)
     if not entity_ids:
         raise SystemExit(f"No Wikidata entity identifiers found under {dataset_dir}")
+    partial_path = output_path.with_name(output_path.name + ".partial")
+    if resume:
+        if not partial_path.exists() and output_path.exists():
+            shutil.copyfile(output_path, partial_path)
+        entity_ids -= load_existing_ids(partial_path)
+    pending = sorted(entity_ids)
+
+    limiter = RateLimiter(delay)
+
+    def fetch(batch: List[str]) -> Dict[str, str]:
+        limiter.wait()
+        return fetch_labels(batch, language)
+
+    total = len(pending)
+    written = 0
+    batches = batched(pending, MAX_IDS_PER_REQUEST)
+    mode = "a" if resume else "w"
+    with partial_path.open(mode, encoding="utf-8") as fh, ThreadPoolExecutor(
+        max_workers=workers
+    ) as executor:
+        # Only `workers` batches are submitted at a time, and they are written in
+        # submission order: a finished batch waits for the ones before it.
+        window: Deque[Tuple[Future, List[str]]] = deque()
 
-    mapping: Dict[str, str] = {}
-    total = len(entity_ids)
-    for index, batch in enumerate(batched(entity_ids, MAX_IDS_PER_REQUEST), start=1):
-        labels = fetch_labels(batch, language)
-        mapping.update(labels)
-        if delay:
-            time.sleep(delay)
-        sys.stderr.write(
-            f"\rFetched labels for {min(index * MAX_IDS_PER_REQUEST, total)} / {total} entities"
-        )
-        sys.stderr.flush()
+        def submit_next() -> None:
+            batch = next(batches, None)
+            if batch:
+                window.append((executor.submit(fetch, batch), batch))
+
+        def write_batch(batch: List[str], labels: Dict[str, str]) -> None:
+            nonlocal written
+            fh.write(
+                "".join(f"{entity_id}\t{labels.get(entity_id, '')}\n" for entity_id in batch)
+            )
+            fh.flush()
+            written += len(batch)
+            sys.stderr.write(f"\rFetched labels for {written} / {total} entities")
+            sys.stderr.flush()
+
+        for _ in range(max(workers, 1)):
+            submit_next()
+        try:
+            while window:
+                future, batch = window[0]
+                labels = future.result()
+                window.popleft()
+                write_batch(batch, labels)
+                submit_next()
+        except BaseException:
+            # A failed batch or Ctrl-C ends the run without submitting more, but
+            # whatever the other in-flight requests return is still kept.
+            for future, batch in window:
+                try:
+                    write_batch(batch, future.result())
+                except Exception:
+                    pass
+            raise
+    os.replace(partial_path, output_path)
     sys.stderr.write("\n")
-    return mapping
+    return written
 
 
 def main() -> None:
@@ -135,17 +289,30 @@ def main() -> None:
         default=0.1,
         help="Delay in seconds between requests to avoid hitting rate limits (default: 0.1).",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help=f"Number of concurrent requests to Wikidata (default: {DEFAULT_WORKERS}).",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted run with the same --language. Rows are written "
+        "to <output>.partial, which replaces --output only once every ID is fetched; "
+        "with --resume that file (or a copy of --output if there is none) is appended "
+        "to and the IDs it already lists are skipped. Without it the mapping is "
+        "fetched from scratch.",
+    )
     args = parser.parse_args()
 
     args.output.parent.mkdir(parents=True, exist_ok=True)
 
-    mapping = build_mapping(args.dataset_dir, args.language, args.sleep)
-
-    with args.output.open("w", encoding="utf-8") as fh:
-        for entity_id, label in sorted(mapping.items()):
-            fh.write(f"{entity_id}\t{label}\n")
+    written = build_mapping(
+        args.dataset_dir, args.output, args.language, args.sleep, args.workers, args.resume
+    )
 
-    print(f"Wrote {len(mapping)} labels to {args.output}")
+    print(f"Wrote {written} labels to {args.output}")
 
 
 if __name__ == "__main__":
@@ -13,10 +13,11 @@ Example:
 """
 
 import argparse
-import csv
 from pathlib import Path
 from typing import Dict, Optional
 
+IO_BUFFER_SIZE = 1 << 20
+
 
 def resolve_delimiter(delimiter: str) -> str:
     if len(delimiter) == 1:
@@ -35,16 +36,13 @@ def resolve_delimiter(delimiter: str) -> str:
 
 def load_mapping(mapping_path: Path, delimiter: str) -> Dict[str, str]:
     mapping: Dict[str, str] = {}
-    with mapping_path.open("r", encoding="utf-8") as fh:
-        reader = csv.reader(fh, delimiter=delimiter)
-        for row in reader:
-            if not row:
-                continue
-            key = row[0].strip()
+    with mapping_path.open("r", encoding="utf-8", buffering=IO_BUFFER_SIZE) as fh:
+        for line in fh:
+            parts = line.rstrip("\n").split(delimiter, 2)
+            key = parts[0].strip()
             if not key:
                 continue
-            label = row[1].strip() if len(row) > 1 else ""
-            mapping[key] = label
+            mapping[key] = parts[1].strip() if len(parts) > 1 else ""
     return mapping
 
 
@@ -58,19 +56,20 @@ def attach_labels(
     if output_path is None:
         output_path = dataset_path.with_suffix(dataset_path.suffix + ".labeled")
 
-    with dataset_path.open("r", encoding="utf-8") as source, output_path.open(
-        "w", encoding="utf-8", newline=""
+    with dataset_path.open(
+        "r", encoding="utf-8", buffering=IO_BUFFER_SIZE
+    ) as source, output_path.open(
+        "w", encoding="utf-8", newline="", buffering=IO_BUFFER_SIZE
     ) as target:
-        reader = csv.reader(source, delimiter=delimiter)
-        writer = csv.writer(target, delimiter=delimiter)
-        for row in reader:
+        for line in source:
+            row = line.rstrip("\n").split(delimiter)
             if len(row) < 3:
-                writer.writerow(row)
+                target.write(line if line.endswith("\n") else line + "\n")
                 continue
             subj, rel, obj, *rest = row
             subj_label = mapping.get(subj, missing_value)
             obj_label = mapping.get(obj, missing_value)
-            writer.writerow([subj, rel, obj, subj_label, obj_label, *rest])
+            target.write(delimiter.join([subj, rel, obj, subj_label, obj_label, *rest]) + "\n")
 
 
 def main() -> None:
@@ -0,0 +1,34 @@
+"""
+Block-wise line reading shared by the TemporalKG scripts.
+
+Each script in this folder is run directly (python scripts/<name>.py), which
+puts this folder on sys.path, so they import this module as a sibling.
+"""
+
+from os import PathLike
+from typing import Iterator, List, Union
+
+READ_CHUNK_SIZE = 1 << 20
+
+
+def read_line_blocks(path: Union[str, PathLike]) -> Iterator[List[str]]:
+    """Yield the lines of a UTF-8 file in blocks, decoding ~1 MiB at a time.
+
+    Decoding and splitting whole chunks avoids the per-line work of the text-mode
+    line iterator, and callers that aggregate per block only hold one block of
+    rows in memory. Lines are split on "\\n" only: they keep a trailing "\\r",
+    and unlike text mode a lone "\\r" is not a line break.
+    """
+    with open(path, "rb") as fh:
+        pending = b""
+        while True:
+            chunk = fh.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            chunk = pending + chunk
+            end = chunk.rfind(b"\n") + 1
+            pending = chunk[end:]
+            if end:
+                yield chunk[: end - 1].decode("utf-8").split("\n")
+        if pending:
+            yield [pending.decode("utf-8")]
@@ -11,14 +11,17 @@ Example:
 import argparse
 import random
 from collections import Counter
+from operator import itemgetter
 from pathlib import Path
-from typing import List, Tuple
+from typing import Iterable, List, Tuple
+
+from line_blocks import read_line_blocks
 
 
 def load_triples(path: Path) -> List[Tuple[str, str, str]]:
     triples: List[Tuple[str, str, str]] = []
-    with path.open("r", encoding="utf-8") as fh:
-        for raw_line in fh:
+    for lines in read_line_blocks(path):
+        for raw_line in lines:
             line = raw_line.strip()
             if not line:
                 continue
@@ -30,23 +33,32 @@ def load_triples(path: Path) -> List[Tuple[str, str, str]]:
 
 
 def find_tail_entities(triples: List[Tuple[str, str, str]], max_frequency: int) -> List[str]:
-    counter = Counter()
-    for subj, _, obj in triples:
-        counter[subj] += 1
-        counter[obj] += 1
+    counter = Counter(map(itemgetter(0), triples))
+    counter.update(map(itemgetter(2), triples))
     return [entity for entity, count in counter.items() if count <= max_frequency]
 
 
 def sample_tail_triples(
-    triples: List[Tuple[str, str, str]],
+    triples: Iterable[Tuple[str, str, str]],
     tail_entities: List[str],
     sample_size: int,
 ) -> List[Tuple[str, str, str]]:
+    # Reservoir sampling (Algorithm R): one pass, holding at most sample_size
+    # triples instead of materialising every tail triple first.
     tail_set = set(tail_entities)
-    tail_triples = [triple for triple in triples if triple[0] in tail_set or triple[2] in tail_set]
-    if len(tail_triples) <= sample_size:
-        return tail_triples
-    return random.sample(tail_triples, sample_size)
+    reservoir: List[Tuple[str, str, str]] = []
+    seen = 0
+    for triple in triples:
+        if triple[0] not in tail_set and triple[2] not in tail_set:
+            continue
+        seen += 1
+        if len(reservoir) < sample_size:
+            reservoir.append(triple)
+        else:
+            index = random.randrange(seen)
+            if index < sample_size:
+                reservoir[index] = triple
+    return reservoir
 
 
 def main() -> None: